@@ -0,0 +1,166 @@
+import json
+import math
+import os
+import re
+import tempfile
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+DEFAULT_BM25_PATH = os.path.join("vectordb", "travelfaq_bm25.json")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "there", "to", "what",
+    "when", "where", "which", "who", "with", "you", "your",
+}
+# Words that mark a question as a lookup of a specific fact such as a phone number
+LOOKUP_TERMS = {
+    "number", "numbers", "phone", "telephone", "contact", "contacts", "hotline", "call", "dial",
+    "email", "address", "emergency", "sos",
+}
+
+
+def tokenize(text):
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+
+# Split a document into small overlapping passages of a few lines each
+def split_passages(text, lines_per_passage=3, stride=2):
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    starts = list(range(0, max(len(lines) - lines_per_passage, 0) + 1, stride))
+    # Add a final window ending at the last line if the stride stepped past it
+    if lines and starts[-1] + lines_per_passage < len(lines):
+        starts.append(len(lines) - lines_per_passage)
+    return ["\n".join(lines[start:start + lines_per_passage]) for start in starts]
+
+
+# Open a temporary file next to path for writing and rename it into place when
+# done, so a session loading the index never reads a half-written file
+@contextmanager
+def write_atomically(path, mode="w"):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with open(fd, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+# Reciprocal rank fusion of several ranked lists of ids
+def rrf_fuse(rankings, k=60):
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            scores[item_id] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+# An in-process BM25 inverted index over passages of the FAQ documents
+class BM25Index:
+    def __init__(self, passages, doc_ids, postings, lengths, k1=1.5, b=0.75):
+        self.passages = passages
+        self.doc_ids = doc_ids
+        self.postings = postings
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        self.idf = {
+            term: math.log(1 + (len(passages) - len(hits) + 0.5) / (len(hits) + 0.5))
+            for term, hits in postings.items()
+        }
+
+    # Build the index from (doc_id, text) pairs
+    @classmethod
+    def from_documents(cls, documents):
+        passages, doc_ids, lengths = [], [], []
+        postings = defaultdict(list)
+        for doc_id, text in documents:
+            for passage in split_passages(text):
+                tokens = tokenize(passage)
+                index = len(passages)
+                passages.append(passage)
+                doc_ids.append(doc_id)
+                lengths.append(len(tokens))
+                for term, tf in Counter(tokens).items():
+                    postings[term].append((index, tf))
+        return cls(passages, doc_ids, dict(postings), lengths)
+
+    @classmethod
+    def load(cls, path=DEFAULT_BM25_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        postings = {term: [tuple(hit) for hit in hits] for term, hits in data["postings"].items()}
+        return cls(data["passages"], data["doc_ids"], postings, data["lengths"])
+
+    @staticmethod
+    def exists(path=DEFAULT_BM25_PATH):
+        return os.path.exists(path)
+
+    def save(self, path=DEFAULT_BM25_PATH):
+        with write_atomically(path) as f:
+            json.dump({
+                "passages": self.passages,
+                "doc_ids": self.doc_ids,
+                "postings": self.postings,
+                "lengths": self.lengths,
+            }, f)
+
+    # BM25 score of every passage matching any of the terms
+    def _score(self, terms):
+        scores = defaultdict(float)
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / self.avg_length)
+                scores[index] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    # Top-k passages for a query as a list of (passage_index, score), best first
+    def search(self, query, k=5):
+        scores = self._score(set(tokenize(query)))
+        return sorted(scores.items(), key=lambda hit: hit[1], reverse=True)[:k]
+
+    # Document ids ranked by their best passage in a list of search hits
+    def rank_documents(self, hits):
+        ranking = []
+        for index, _ in hits:
+            if self.doc_ids[index] not in ranking:
+                ranking.append(self.doc_ids[index])
+        return ranking
+
+    # Return a direct answer when the query is a lookup (e.g. "phone number in
+    # Japan") and exactly one passage clearly matches the rest of the query.
+    # Candidates are ranked on the key terms only, since the lookup words match
+    # generic FAQ passages better than the passage that holds the answer.
+    def direct_answer(self, query, margin=1.5):
+        terms = set(tokenize(query))
+        if not terms & LOOKUP_TERMS:
+            return None
+        key_terms = terms - LOOKUP_TERMS
+        if not key_terms:
+            return None
+        scores = self._score(key_terms)
+        candidates = sorted(
+            (index for index in scores if key_terms <= set(tokenize(self.passages[index]))),
+            key=scores.get, reverse=True,
+        )
+        if not candidates:
+            return None
+        top_index = candidates[0]
+        # Neighbouring passages overlap the top one, so they don't count as rivals
+        rivals = [
+            scores[index] for index in candidates[1:]
+            if abs(index - top_index) > 1 or self.doc_ids[index] != self.doc_ids[top_index]
+        ]
+        if rivals and scores[top_index] < margin * rivals[0]:
+            return None
+        # Prefer the single line that holds the key terms over the whole passage
+        lines = [line for line in self.passages[top_index].splitlines() if key_terms <= set(tokenize(line))]
+        return lines[0] if lines else self.passages[top_index]
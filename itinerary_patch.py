@@ -0,0 +1,33 @@
+import re
+
+
+# Apply line edits of the form "REPLACE n: text", "DELETE n" and
+# "INSERT AFTER n: text" to a plan. Returns None if the patch has no valid edits.
+def apply_itinerary_patch(plan, patch):
+    lines = plan.splitlines()
+    replaced, deleted, inserted = {}, set(), {}
+    for edit in patch.splitlines():
+        edit = edit.strip()
+        if match := re.match(r"REPLACE (\d+):\s?(.*)$", edit):
+            replaced[int(match.group(1))] = match.group(2)
+        elif match := re.match(r"DELETE (\d+)$", edit):
+            deleted.add(int(match.group(1)))
+        elif match := re.match(r"INSERT AFTER (\d+):\s?(.*)$", edit):
+            inserted.setdefault(int(match.group(1)), []).append(match.group(2))
+    edited = set(replaced) | deleted | set(inserted)
+    if not edited or any(n < 0 or n > len(lines) for n in edited) or 0 in set(replaced) | deleted:
+        return None
+
+    patched = list(inserted.get(0, []))
+    for number, line in enumerate(lines, start=1):
+        if number not in deleted:
+            patched.append(replaced.get(number, line))
+        patched.extend(inserted.get(number, []))
+    return "\n".join(patched)
+
+
+# Whether a patched plan mentions every added stop and none of the removed ones.
+# A patch that parses can still miss the change (e.g. replacing a line with itself).
+def plan_reflects_changes(plan, added, removed):
+    text = plan.lower()
+    return all(place.lower() in text for place in added) and not any(place.lower() in text for place in removed)
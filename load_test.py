@@ -0,0 +1,391 @@
+import argparse
+import gc
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest import mock
+
+from streamlit.testing.v1 import AppTest
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Page scripts and the interaction each simulated session repeats
+PAGES = {
+    "Explore": "page1.py",
+    "Itinerary": "page2.py",
+    "Translator": "page3.py",
+    "Assistant": "page4.py",
+}
+
+SECRETS = {
+    "api_key": "stub-google-key",
+    "key1": "stub-openai-key",
+    "openai_api_key": "stub-openai-key",
+    "OpenWeatherAPIkey": "stub-weather-key",
+    # Avoid chromadb/pysqlite3 so the Assistant page runs without a database
+    "retriever_backend": "numpy",
+}
+
+CITIES = ["Paris", "Tokyo", "Rome", "Madrid", "Berlin", "Syracuse"]
+
+# Simulated upstream latency in seconds, set from --upstream-latency
+UPSTREAM_LATENCY = 0.0
+
+
+# ---- Stubbed upstreams ---------------------------------------------------
+
+def _photo_bytes():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 300), (120, 160, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+PHOTO_BYTES = _photo_bytes()
+
+
+class FakeResponse:
+    def __init__(self, payload=None, content=b"", status_code=200):
+        self._payload = payload
+        self.content = content
+        self.status_code = status_code
+        self.text = json.dumps(payload) if payload is not None else ""
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        pass
+
+
+def _places(query, count=9):
+    return [
+        {
+            "name": f"{query} #{i}",
+            "formatted_address": f"{i} Main St, {query}",
+            "rating": 3.5 + (i % 3) * 0.5,
+            "user_ratings_total": 100 + i,
+            "price_level": i % 4,
+            "photos": [{"photo_reference": f"{hashlib.md5(query.encode()).hexdigest()}-{i}"}],
+            "geometry": {"location": {"lat": 48.85 + i / 100, "lng": 2.35 + i / 100}},
+        }
+        for i in range(count)
+    ]
+
+
+def fake_requests_get(url, params=None, **kwargs):
+    time.sleep(UPSTREAM_LATENCY)
+    if "place/textsearch" in url:
+        return FakeResponse({"results": _places(params["query"])})
+    if "place/photo" in url:
+        return FakeResponse(content=PHOTO_BYTES)
+    if "openweathermap" in url:
+        return FakeResponse({"weather": [{"description": "clear sky"}], "main": {"temp": 293.0}})
+    return FakeResponse({}, status_code=404)
+
+
+def _embedding(text, dims=64):
+    vector = [0.0] * dims
+    for token in text.lower().split():
+        vector[int(hashlib.md5(token.encode()).hexdigest(), 16) % dims] += 1.0
+    return vector
+
+
+class FakeCompletions:
+    def create(self, model, messages, functions=None, stream=False, **kwargs):
+        time.sleep(UPSTREAM_LATENCY)
+        query = messages[-1]["content"]
+        if functions:
+            city = next((c for c in CITIES if c.lower() in query.lower()), CITIES[0])
+            arguments = json.dumps({
+                "get_Weather": {"location": city},
+                "get_places_from_google": {"query": query},
+            })
+            message = SimpleNamespace(content=None, function_call=SimpleNamespace(name="multi_Func", arguments=arguments))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        text = f"Stub answer from {model}."
+        if stream:
+            return iter(
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+                for word in text.split()
+            )
+        message = SimpleNamespace(content=text, function_call=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class FakeEmbeddings:
+    def create(self, input, model):
+        time.sleep(UPSTREAM_LATENCY)
+        inputs = [input] if isinstance(input, str) else input
+        return SimpleNamespace(data=[SimpleNamespace(embedding=_embedding(text)) for text in inputs])
+
+
+class FakeOpenAI:
+    def __init__(self, *args, **kwargs):
+        self.chat = SimpleNamespace(completions=FakeCompletions())
+        self.embeddings = FakeEmbeddings()
+
+    def with_options(self, **kwargs):
+        return self
+
+
+class FakeChatOpenAI:
+    def __init__(self, model=None, **kwargs):
+        self.model = model
+
+    def __call__(self, messages):
+        time.sleep(UPSTREAM_LATENCY)
+        return SimpleNamespace(content=f"Stub itinerary from {self.model}.")
+
+
+def stub_upstreams():
+    stack = ExitStack()
+    stack.enter_context(mock.patch("requests.get", fake_requests_get))
+    stack.enter_context(mock.patch("openai.OpenAI", FakeOpenAI))
+    stack.enter_context(mock.patch("langchain.chat_models.ChatOpenAI", FakeChatOpenAI, create=True))
+    return stack
+
+
+# ---- Sessions ------------------------------------------------------------
+
+def new_session(page, timeout):
+    at = AppTest.from_file(os.path.join(REPO_DIR, PAGES[page]), default_timeout=timeout)
+    for key, value in SECRETS.items():
+        at.secrets[key] = value
+    return at
+
+
+# One user action on a page; returns the AppTest after the rerun
+def interact(page, at, step):
+    city = CITIES[step % len(CITIES)]
+    if page == "Explore":
+        return at.text_input[0].input(f"museums in {city}").run()
+    if page == "Itinerary":
+        at.text_input[0].input(f"parks in {city}").run()
+        add_buttons = [b for b in at.button if (b.key or "").startswith("add_")]
+        if add_buttons:
+            add_buttons[step % len(add_buttons)].click().run()
+        remove_buttons = [b for b in at.button if (b.key or "").startswith("remove_")]
+        if len(remove_buttons) > 1:
+            remove_buttons[0].click().run()
+        generate = [b for b in at.button if b.label == "Generate AI Itinerary"]
+        return generate[0].click().run() if generate else at
+    if page == "Translator":
+        return at.chat_input[0].set_value(f"Where is the station in {city}?").run()
+    if page == "Assistant":
+        return at.chat_input[0].set_value(f"What is the emergency phone number for {city}?").run()
+    raise ValueError(f"Unknown page: {page}")
+
+
+# Drive sessions through a page in a worker process and measure them.
+# AppTest swaps a process-global runtime on every run, so concurrent sessions
+# need their own processes; that also makes tracemalloc numbers per session.
+# Failures are returned in "errors" rather than raised, so one bad session
+# doesn't throw away everyone else's results.
+def run_session(page, iterations, timeout, upstream_latency, workdir, barrier):
+    global UPSTREAM_LATENCY
+    UPSTREAM_LATENCY = upstream_latency
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+    result = {
+        "page": page,
+        "latencies": [],
+        "window": None,
+        "errors": [],
+        "retained": 0,
+        "peak": 0,
+        "top_files": [],
+        "state_sizes": [],
+    }
+    latencies, errors = result["latencies"], result["errors"]
+    with stub_upstreams():
+        # A throwaway session first, so imports and process-wide caches aren't counted
+        try:
+            warmup = new_session(page, timeout).run()
+            if not warmup.exception:
+                interact(page, warmup, 0)
+            del warmup
+        except Exception as e:
+            errors.append(f"warm-up: {e!r}")
+        gc.collect()
+
+        # Start together so the sessions really overlap. The timeout covers a
+        # slow warm-up elsewhere; a session that died before getting here breaks
+        # the barrier instead of leaving the rest waiting forever.
+        try:
+            barrier.wait(timeout * (iterations + 2))
+        except threading.BrokenBarrierError:
+            errors.append("barrier broken: another session failed before the timed pass")
+
+        # Timed pass, with tracemalloc off since it slows every allocation down
+        window_start = time.time()
+        try:
+            at = new_session(page, timeout)
+            start = time.perf_counter()
+            at.run()
+            latencies.append(time.perf_counter() - start)
+            for step in range(iterations):
+                if at.exception:
+                    break
+                start = time.perf_counter()
+                at = interact(page, at, step)
+                latencies.append(time.perf_counter() - start)
+            if at.exception:
+                errors.append(str(at.exception[0].message))
+            del at
+        except Exception as e:
+            errors.append(f"timed pass: {e!r}")
+        result["window"] = (window_start, time.time())
+        gc.collect()
+
+        # Memory pass: the same interactions on a fresh session under tracemalloc
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            at = new_session(page, timeout).run()
+            for step in range(iterations):
+                if at.exception:
+                    break
+                at = interact(page, at, step)
+            gc.collect()
+            after = tracemalloc.take_snapshot()
+            result["peak"] = tracemalloc.get_traced_memory()[1]
+        except Exception as e:
+            errors.append(f"memory pass: {e!r}")
+            return result
+        finally:
+            tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    state = session_state_items(at)
+    result["retained"] = sum(stat.size_diff for stat in stats)
+    result["top_files"] = [(_short_path(stat.traceback[0].filename), stat.size_diff) for stat in stats[:3]]
+    result["state_sizes"] = sorted(((deep_sizeof(value), key) for key, value in state.items()), reverse=True)[:5]
+    return result
+
+
+def _short_path(filename):
+    if filename.startswith(REPO_DIR):
+        return os.path.relpath(filename, REPO_DIR)
+    return filename
+
+
+def session_state_items(at):
+    state = at.session_state
+    filtered = getattr(state, "filtered_state", None)
+    if filtered is not None:
+        return dict(filtered)
+    return {key: state[key] for key in state}
+
+
+# Approximate deep size of an object graph in bytes
+def deep_sizeof(obj, seen=None):
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(pages, results, sessions, iterations):
+    # Throughput over the timed interactions only, not process spawn, imports or warm-up
+    windows = [result["window"] for result in results if result["window"]]
+    window = max(end for _, end in windows) - min(start for start, _ in windows) if windows else 0.0
+    print(f"\n== {sessions} concurrent sessions, {iterations} interactions each, {window:.2f}s measured ==")
+    print("Each session runs alone in its own process, so process-wide caches (prefetch.cache,")
+    print("the model router, st.cache_data) are not shared between the simulated sessions.")
+    print("Latencies come from a pass with tracemalloc off; memory from a separate traced pass.")
+    print(f"{'page':<12}{'runs':>6}{'runs/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'errors':>8}{'KiB/session':>13}{'peak KiB':>10}")
+    for page in pages:
+        page_results = [result for result in results if result["page"] == page]
+        if not page_results:
+            continue
+        values = [value for result in page_results for value in result["latencies"]]
+        errors = [error for result in page_results for error in result["errors"]]
+        retained = sum(result["retained"] for result in page_results) / len(page_results)
+        peak = max(result["peak"] for result in page_results)
+        print(
+            f"{page:<12}{len(values):>6}{len(values) / window if window else 0.0:>9.1f}"
+            f"{percentile(values, 50) * 1000:>9.0f}{percentile(values, 95) * 1000:>9.0f}"
+            f"{percentile(values, 99) * 1000:>9.0f}{len(errors):>8}"
+            f"{retained / 1024:>13.0f}{peak / 1024:>10.0f}"
+        )
+
+    print("\n== Where each session's memory goes (first session of each page) ==")
+    for page in pages:
+        page_results = [result for result in results if result["page"] == page]
+        if not page_results:
+            continue
+        result = page_results[0]
+        print(f"{page}:")
+        for filename, size in result["top_files"]:
+            print(f"    {size / 1024:>8.0f} KiB  {filename}")
+        for size, key in result["state_sizes"]:
+            print(f"    session_state[{key!r}]: {size / 1024:.1f} KiB")
+        for message in sorted(set(result["errors"]))[:3]:
+            print(f"    error: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the travel pages with stubbed upstreams.")
+    parser.add_argument("--sessions", type=int, default=8, help="Number of concurrent sessions.")
+    parser.add_argument("--iterations", type=int, default=5, help="Interactions per session.")
+    parser.add_argument("--pages", nargs="+", choices=list(PAGES), default=list(PAGES))
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Seconds each stubbed upstream call takes.")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds allowed for one script run.")
+    args = parser.parse_args()
+
+    # Run from a scratch directory so index artifacts and audio files stay out of the repo
+    workdir = tempfile.mkdtemp(prefix="travel-load-test-")
+    os.symlink(os.path.join(REPO_DIR, "datafiles"), os.path.join(workdir, "datafiles"))
+    # Build the Assistant's index once up front instead of racing to build it in every session
+    sys.path.insert(0, REPO_DIR)
+    from numpy_index import DEFAULT_INDEX_PATH, build_index
+    from bm25_index import DEFAULT_BM25_PATH
+    build_index(
+        FakeOpenAI(), os.path.join(workdir, "datafiles"),
+        os.path.join(workdir, DEFAULT_INDEX_PATH), os.path.join(workdir, DEFAULT_BM25_PATH),
+    )
+
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, ProcessPoolExecutor(max_workers=args.sessions, mp_context=context) as pool:
+        barrier = manager.Barrier(args.sessions)
+        futures = [
+            pool.submit(
+                run_session, args.pages[i % len(args.pages)], args.iterations,
+                args.timeout, args.upstream_latency, workdir, barrier,
+            )
+            for i in range(args.sessions)
+        ]
+        results = [future.result() for future in futures]
+    report(args.pages, results, args.sessions, args.iterations)
+
+if __name__ == "__main__":
+    main()
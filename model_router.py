@@ -0,0 +1,120 @@
+import math
+import threading
+import time
+from collections import deque
+
+import openai
+
+# Primary and fallback model for each task, with the latency SLO (seconds)
+# the primary is expected to meet. The SLO is also used as the request timeout.
+# For streamed calls (weather_summary) latency is measured to the first chunk,
+# since the call returns once the stream opens.
+TASK_MODELS = {
+    "translate": {"primary": "gpt-4o-mini", "fallback": "gpt-4o", "slo": 4.0},
+    "weather_summary": {"primary": "gpt-4o-mini", "fallback": "gpt-4o", "slo": 6.0},
+    "itinerary": {"primary": "gpt-4o-mini", "fallback": "gpt-4o", "slo": 30.0},
+    "faq_answer": {"primary": "gpt-4o-mini", "fallback": "gpt-4o", "slo": 8.0},
+    "tool_routing": {"primary": "gpt-4o", "fallback": "gpt-4o-mini", "slo": 8.0},
+}
+
+# Number of recent calls per task and model used for the rolling p95
+WINDOW_SIZE = 50
+# Samples older than this many seconds no longer count towards the p95
+SAMPLE_MAX_AGE = 5 * 60
+# Minimum samples before the p95 is trusted to reorder primary/fallback
+MIN_SAMPLES = 5
+# While the primary is demoted, every PROBE_EVERY-th call still tries it first
+# so it can show it has recovered
+PROBE_EVERY = 10
+
+
+class ModelRouter:
+    def __init__(self, task_models=TASK_MODELS, window_size=WINDOW_SIZE, clock=time.monotonic):
+        self.task_models = task_models
+        self.window_size = window_size
+        self.clock = clock
+        self._latencies = {}
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    # Record how long a call to a model took for a task. Samples are kept per
+    # task, since tasks differ widely in latency and each has its own SLO.
+    def record(self, task, model, seconds):
+        with self._lock:
+            samples = self._latencies.setdefault((task, model), deque(maxlen=self.window_size))
+            samples.append((self.clock(), seconds))
+
+    # Latencies of a model on a task that are recent enough to count
+    def _recent(self, task, model):
+        cutoff = self.clock() - SAMPLE_MAX_AGE
+        with self._lock:
+            return [seconds for recorded_at, seconds in self._latencies.get((task, model), ()) if recorded_at >= cutoff]
+
+    # Rolling p95 latency of a model on a task, or None if there is no data yet
+    def p95(self, task, model):
+        samples = sorted(self._recent(task, model))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))
+        return samples[index]
+
+    # Models to try for a task, in order. The primary goes first unless its
+    # rolling p95 is over the SLO, in which case the fallback is tried first,
+    # apart from the occasional probe of the primary.
+    def models_for(self, task):
+        config = self.task_models[task]
+        primary, fallback = config["primary"], config["fallback"]
+        with self._lock:
+            self._calls[task] = self._calls.get(task, 0) + 1
+            probe = self._calls[task] % PROBE_EVERY == 0
+        primary_samples = len(self._recent(task, primary))
+        primary_p95 = self.p95(task, primary)
+        if primary_samples >= MIN_SAMPLES and primary_p95 > config["slo"] and not probe:
+            return [fallback, primary]
+        return [primary, fallback]
+
+    # Run call(model, timeout) for a task, falling back on timeouts and 429s
+    def run(self, task, call):
+        timeout = self.task_models[task]["slo"]
+        models = self.models_for(task)
+        last_error = None
+        for attempt, model in enumerate(models):
+            # The last model gets no hard timeout so the user still gets an answer
+            model_timeout = timeout if attempt < len(models) - 1 else None
+            start = time.perf_counter()
+            try:
+                result = call(model, model_timeout)
+            except Exception as e:
+                if not _should_fall_back(e):
+                    raise
+                # Count the failure as slower than any success, so a run of fast
+                # 429s demotes the model just like a run of timeouts
+                self.record(task, model, math.inf)
+                last_error = e
+                continue
+            self.record(task, model, time.perf_counter() - start)
+            return result
+        raise last_error
+
+    # Route an OpenAI chat completion for a task through the configured models
+    def chat_completion(self, client, task, **kwargs):
+        def call(model, timeout):
+            if timeout is not None:
+                # Don't let the client's own retries eat into the fallback's time
+                client_for_call = client.with_options(timeout=timeout, max_retries=0)
+            else:
+                client_for_call = client
+            return client_for_call.chat.completions.create(model=model, **kwargs)
+
+        return self.run(task, call)
+
+
+# Timeouts and rate limits are worth retrying on another model; anything else is not
+def _should_fall_back(error):
+    if isinstance(error, (openai.APITimeoutError, openai.RateLimitError, TimeoutError)):
+        return True
+    return getattr(error, "status_code", None) == 429
+
+
+# Shared by every page and session in the process
+router = ModelRouter()
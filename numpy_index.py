@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from PyPDF2 import PdfReader
+
+from bm25_index import DEFAULT_BM25_PATH, BM25Index, write_atomically
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Writes <path>.npy (float32 embeddings) and <path>.json (ids and documents)
+DEFAULT_INDEX_PATH = os.path.join("vectordb", "travelfaq")
+
+
+# Read the text of every PDF in a folder, as (filename, text) pairs
+def read_pdf_texts(datafiles_path):
+    pdf_files = sorted(f for f in os.listdir(datafiles_path) if f.endswith('.pdf'))
+    texts = []
+    for pdf_file in pdf_files:
+        file_path = os.path.join(datafiles_path, pdf_file)
+        with open(file_path, 'rb') as file:
+            pdf_reader = PdfReader(file)
+            text = ""
+            for page in pdf_reader.pages:
+                text += page.extract_text()
+        texts.append((pdf_file, text))
+    return texts
+
+
+# Scale each row to unit length so a dot product is the cosine similarity
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# A small vector index backed by a memory-mapped .npy matrix.
+# query() takes the same arguments and returns the same shape as a Chroma
+# collection's query(), so either can be stored as the FAQ vector DB.
+class NumpyIndex:
+    def __init__(self, embeddings, ids, documents, metadatas=None):
+        self.embeddings = embeddings
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas or [None] * len(ids)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH):
+        embeddings = np.load(path + ".npy", mmap_mode="r")
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        return cls(embeddings, metadata["ids"], metadata["documents"], metadata.get("metadatas"))
+
+    @staticmethod
+    def exists(path=DEFAULT_INDEX_PATH):
+        return os.path.exists(path + ".npy") and os.path.exists(path + ".json")
+
+    # Each file is written atomically, and the .npy last, so exists() only sees
+    # a finished artifact even while several sessions build it at once
+    def save(self, path=DEFAULT_INDEX_PATH):
+        with write_atomically(path + ".json") as f:
+            json.dump({"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas}, f)
+        with write_atomically(path + ".npy", "wb") as f:
+            np.save(f, np.asarray(self.embeddings, dtype=np.float32))
+
+    def query(self, query_embeddings, n_results=10, include=('documents', 'distances', 'metadatas')):
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        # Rows are normalized at build time, so one matmul gives every cosine similarity
+        similarities = queries @ self.embeddings.T
+        k = min(n_results, len(self.ids))
+        results = {"ids": [], "documents": [], "distances": [], "metadatas": []}
+        for row in similarities:
+            top = np.argpartition(-row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+            top = top[np.argsort(-row[top])]
+            results["ids"].append([self.ids[i] for i in top])
+            results["documents"].append([self.documents[i] for i in top])
+            # Cosine distance, matching Chroma's "hnsw:space": "cosine"
+            results["distances"].append([float(1.0 - row[i]) for i in top])
+            results["metadatas"].append([self.metadatas[i] for i in top])
+        return {key: value for key, value in results.items() if key == "ids" or key in include}
+
+
+# Embed every PDF in datafiles_path and write the index artifact to path,
+# along with the BM25 index over the same documents to bm25_path
+def build_index(openai_client, datafiles_path, path=DEFAULT_INDEX_PATH, bm25_path=DEFAULT_BM25_PATH):
+    texts = read_pdf_texts(datafiles_path)
+    ids = [filename for filename, _ in texts]
+    documents = [text for _, text in texts]
+    response = openai_client.embeddings.create(input=documents, model=EMBEDDING_MODEL)
+    embeddings = _normalize(np.array([item.embedding for item in response.data], dtype=np.float32))
+    index = NumpyIndex(embeddings, ids, documents)
+    index.save(path)
+    BM25Index.from_documents(texts).save(bm25_path)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the NumPy vector index for the Travel Assistant FAQ.")
+    parser.add_argument("--datafiles", default="datafiles", help="Folder containing the FAQ PDFs.")
+    parser.add_argument("--output", default=DEFAULT_INDEX_PATH, help="Output path, without the .npy/.json extension.")
+    parser.add_argument("--bm25-output", default=DEFAULT_BM25_PATH, help="Output path for the BM25 index.")
+    args = parser.parse_args()
+
+    from openai import OpenAI
+    # Reads OPENAI_API_KEY from the environment
+    index = build_index(OpenAI(), args.datafiles, args.output, args.bm25_output)
+    print(f"Wrote {len(index.ids)} documents to {args.output}.npy, {args.output}.json and {args.bm25_output}")
+
+
+if __name__ == "__main__":
+    main()
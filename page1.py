@@ -1,14 +1,19 @@
 import streamlit as st
-import requests
 from openai import OpenAI
 import json
 import time
+from model_router import router
+from prefetch import Prefetcher, fetch_weather, search_places
 
 # Initialize session state for chat history and search history
 if 'messages' not in st.session_state:
     st.session_state['messages'] = []
 if 'search_history' not in st.session_state:
     st.session_state['search_history'] = []
+if 'explore_request' not in st.session_state:
+    st.session_state['explore_request'] = None
+if 'explore_result' not in st.session_state:
+    st.session_state['explore_result'] = None
 
 # Streamlit app title and sidebar filters
 st.title("🌍 **Interactive Travel Guide Chatbot** 🤖")
@@ -26,6 +31,15 @@ with st.sidebar:
 api_key = st.secrets["api_key"]
 openai_api_key = st.secrets["key1"]
 
+# Setup OpenAI client once per session
+if 'openai_client' not in st.session_state:
+    st.session_state.openai_client = OpenAI(api_key=openai_api_key)
+
+# Background prefetcher for this session, kept alive by reruns
+if 'prefetcher' not in st.session_state:
+    st.session_state.prefetcher = Prefetcher(api_key, st.secrets.get("OpenWeatherAPIkey"))
+st.session_state.prefetcher.touch()
+
 
 functions = [
             {
@@ -66,34 +80,17 @@ functions = [
 
 # Weather data function
 def get_Weather(location, API_key):
-    if "," in location:
-        location = location.split(",")[0].strip()
-
-    urlbase = "https://api.openweathermap.org/data/2.5/"
-    urlweather = f"weather?q={location}&appid={API_key}"
-    url = urlbase + urlweather
-    response = requests.get(url)
-    data = response.json()
-    
-    return data
+    return fetch_weather(location, API_key)
 
 # Function to fetch places from Google Places API
 def fetch_places_from_google(query):
-    base_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {
-        "query": query,
-        "key": api_key
-    }
     try:
-        response = requests.get(base_url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            results = data.get("results", [])
-            # Filter by minimum rating and limit results
-            filtered_results = [place for place in results if place.get("rating", 0) >= min_rating]
-            return filtered_results[:max_results]
-        else:
-            return {"error": f"API error {response.status_code}: {response.text}"}
+        results = search_places(query, api_key)
+        if isinstance(results, dict):
+            return results
+        # Filter by minimum rating and limit results
+        filtered_results = [place for place in results if place.get("rating", 0) >= min_rating]
+        return filtered_results[:max_results]
     except Exception as e:
         return {"error": str(e)}
 
@@ -101,9 +98,10 @@ def fetch_places_from_google(query):
 # Function for interacting with OpenAI's API
 def chat_completion_request(messages):
     try:
-        client = OpenAI(api_key=openai_api_key)
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        client = st.session_state.openai_client
+        response = router.chat_completion(
+            client,
+            "tool_routing",
             messages=messages,
             functions = functions,
             function_call="auto"
@@ -114,6 +112,36 @@ def chat_completion_request(messages):
         return None
 
 
+# Display places returned by the Google Places API
+def display_places(query, places_data):
+    st.markdown(f"Searching for: **{query}**")
+    if isinstance(places_data, dict) and "error" in places_data:
+        st.error(f"Error: {places_data['error']}")
+    elif not places_data:
+        st.warning("No places found matching your criteria.")
+    else:
+        st.markdown("### 📍 Top Recommendations")
+        for idx, place in enumerate(places_data):
+            with st.expander(f"{idx + 1}. {place.get('name', 'No Name')}"):
+                st.write(f"📍 **Address**: {place.get('formatted_address', 'No address available')}")
+                st.write(f"🌟 **Rating**: {place.get('rating', 'N/A')} (Based on {place.get('user_ratings_total', 'N/A')} reviews)")
+                st.write(f"💲 **Price Level**: {place.get('price_level', 'N/A')}")
+                if "photos" in place:
+                    photo_ref = place["photos"][0]["photo_reference"]
+                    photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={photo_ref}&key={api_key}"
+                    st.image(photo_url, caption=place.get("name", "Photo"), use_column_width=True)
+                lat, lng = place["geometry"]["location"].values()
+                map_url = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
+                st.markdown(f"[📍 View on Map]({map_url})", unsafe_allow_html=True)
+
+# Re-render a stored result from session state without calling any API
+def display_explore_result(result):
+    if "weather_location" in result:
+        st.markdown(f"Fetching weather for: **{result['weather_location']}**")
+        st.markdown(result["weather_summary"])
+    if "places_query" in result:
+        display_places(result["places_query"], result["places"])
+
 # Handle function calls from GPT response
 def handle_function_calls(response_message):
     function_call = response_message.function_call
@@ -122,6 +150,7 @@ def handle_function_calls(response_message):
         function_args = json.loads(function_call.arguments)
         
         weather_data, places_data = None, None
+        result = {}
 
         # Process get_Weather if provided
         if function_args.get("get_Weather"):
@@ -134,9 +163,10 @@ def handle_function_calls(response_message):
                     {"role": "user", "content": "Explain in normal English in few words including what kind of clothing can be worn and what tips need to be taken based on the following weather data."},
                     {"role": "user", "content": json.dumps(weather_data)}
                 ]
-                client = OpenAI(api_key=openai_api_key)
-                stream = client.chat.completions.create(
-                    model="gpt-4o",
+                client = st.session_state.openai_client
+                stream = router.chat_completion(
+                    client,
+                    "weather_summary",
                     messages=messages,
                     stream = True
                 )
@@ -148,32 +178,24 @@ def handle_function_calls(response_message):
                             full_response += chunk.choices[0].delta.content
                             message_placeholder.markdown(full_response + "▌")
                     message_placeholder.markdown(full_response)
+                result["weather_location"] = location
+                result["weather_summary"] = full_response
                 
         # Process get_places_from_google if provided
         if function_args.get("get_places_from_google"):
             query = function_args["get_places_from_google"].get("query")
             if query:
-                st.markdown(f"Searching for: **{query}**")
                 places_data = fetch_places_from_google(query)
+                # Warm the weather and keep the search fresh. Photos are loaded by the
+                # browser straight from their URLs, so they are not prefetched here.
+                st.session_state.prefetcher.track_search(query)
+                st.session_state.prefetcher.warm_weather(query)
+                result["places_query"] = query
+                result["places"] = places_data
+                display_places(query, places_data)
 
-                if isinstance(places_data, dict) and "error" in places_data:
-                    st.error(f"Error: {places_data['error']}")
-                elif not places_data:
-                    st.warning("No places found matching your criteria.")
-                else:
-                    st.markdown("### 📍 Top Recommendations")
-                    for idx, place in enumerate(places_data):
-                        with st.expander(f"{idx + 1}. {place.get('name', 'No Name')}"):
-                            st.write(f"📍 **Address**: {place.get('formatted_address', 'No address available')}")
-                            st.write(f"🌟 **Rating**: {place.get('rating', 'N/A')} (Based on {place.get('user_ratings_total', 'N/A')} reviews)")
-                            st.write(f"💲 **Price Level**: {place.get('price_level', 'N/A')}")
-                            if "photos" in place:
-                                photo_ref = place["photos"][0]["photo_reference"]
-                                photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={photo_ref}&key={api_key}"
-                                st.image(photo_url, caption=place.get("name", "Photo"), use_column_width=True)
-                            lat, lng = place["geometry"]["location"].values()
-                            map_url = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
-                            st.markdown(f"[📍 View on Map]({map_url})", unsafe_allow_html=True)
+        # Keep the result so reruns re-render it instead of calling the APIs again
+        st.session_state['explore_result'] = result
 
     else:
         st.error("Function call is incomplete.")
@@ -186,7 +208,11 @@ for message in st.session_state['messages']:
 # Display chat history and handle user input
 user_query = st.text_input("🔍 What are you looking for? (e.g., 'restaurants in Los Angeles'):", value=selected_query)
 
-if user_query:
+# Only call OpenAI and the upstream APIs when the query or filters change
+explore_request = (user_query, min_rating, max_results)
+if user_query and st.session_state['explore_request'] != explore_request:
+    st.session_state['explore_request'] = explore_request
+    st.session_state['explore_result'] = None
     if user_query not in st.session_state["search_history"]:
         st.session_state["search_history"].append(user_query)
 
@@ -206,3 +232,5 @@ if user_query:
             st.session_state['messages'].append({"role": "assistant", "content": response_message.content})
             with st.chat_message("assistant"):
                 st.markdown(response_message.content)
+elif user_query and st.session_state['explore_result']:
+    display_explore_result(st.session_state['explore_result'])
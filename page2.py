@@ -1,56 +1,69 @@
 import streamlit as st
-import requests
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.schema import HumanMessage
 from datetime import date
 from PIL import Image
 import io
+from itinerary_patch import apply_itinerary_patch, plan_reflects_changes
+from model_router import router
+from prefetch import Prefetcher, cache, fetch_photo, photo_url, search_places
+
+# Generated itineraries are shared across sessions for this long, in seconds
+ITINERARY_TTL = 60 * 60
 
 # Function to fetch places from Google Places API
 def fetch_places_from_google(query):
-    base_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {"query": query, "key": api_key}
     try:
-        response = requests.get(base_url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            results = data.get("results", [])
-            # Filter by minimum rating and limit results
-            filtered_results = [place for place in results if place.get("rating", 0) >= min_rating]
-            return filtered_results[:max_results]
-        else:
-            return {"error": f"API error {response.status_code}: {response.text}"}
+        results = search_places(query, api_key)
+        if isinstance(results, dict):
+            return results
+        # Filter by minimum rating and limit results
+        filtered_results = [place for place in results if place.get("rating", 0) >= min_rating]
+        return filtered_results[:max_results]
     except Exception as e:
         return {"error": str(e)}
 
-# Helper function to resize images
+# Helper function to resize images, cached so reruns don't re-download photos.
+# Raises if fetching or resizing fails, so failures aren't cached and are retried.
+@st.cache_data(show_spinner=False, max_entries=200, ttl=3600)
 def fetch_and_resize_image(url, size=(200, 200)):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        img = Image.open(io.BytesIO(response.content))
-        img = img.resize(size)  # Resize to uniform dimensions
-        return img
-    except Exception as e:
-        return None  # Return None if fetching or resizing fails
+    # Usually already downloaded by the prefetcher
+    img = Image.open(io.BytesIO(fetch_photo(url)))
+    img = img.resize(size)  # Resize to uniform dimensions
+    return img
+
+# Button callbacks for the itinerary bucket; they run before the rerun they trigger
+def add_to_bucket(name):
+    if name not in st.session_state['itinerary_bucket']:
+        st.session_state['itinerary_bucket'].append(name)
+
+def remove_from_bucket(name):
+    if name in st.session_state['itinerary_bucket']:
+        st.session_state['itinerary_bucket'].remove(name)
+
+def clear_bucket():
+    st.session_state['itinerary_bucket'] = []
 
-# Display places in 3x3 grid layout with uniform image sizes and consistent spacing
-def display_places_grid(places):
+# Display places in 3x3 grid layout with uniform image sizes and consistent spacing.
+# Runs as a fragment so its buttons only rerun the grid, using the results in session state.
+@st.fragment
+def display_places_grid():
+    places = st.session_state['places_results']
     cols = st.columns(3, gap="medium")  # Adjust gap for spacing between columns
     for idx, place in enumerate(places):
         with cols[idx % 3]:  # Distribute places evenly across 3 columns
             name = place.get("name", "No Name")
             lat, lng = place["geometry"]["location"].values()
             map_url = f"https://www.google.com/maps/search/?api=1&query={lat},{lng}"
-            photo_url = None
-            if "photos" in place:
-                photo_ref = place["photos"][0]["photo_reference"]
-                photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference={photo_ref}&key={api_key}"
+            url = photo_url(place, api_key)
 
             # Fetch and display image
-            if photo_url:
-                img = fetch_and_resize_image(photo_url, size=(200, 200))  # Set uniform size
+            if url:
+                try:
+                    img = fetch_and_resize_image(url, size=(200, 200))  # Set uniform size
+                except Exception:
+                    img = None
                 if img:
                     st.image(img, caption=name, use_column_width=False)
                 else:
@@ -64,49 +77,159 @@ def display_places_grid(places):
             # Manage itinerary bucket
             if name in st.session_state['itinerary_bucket']:
                 st.button("Added", disabled=True, key=f"added_{idx}")
-            else:
-                if st.button("Add to Itinerary", key=f"add_{idx}"):
-                    st.session_state['itinerary_bucket'].append(name)
+            elif st.button("Add to Itinerary", key=f"add_{idx}", on_click=add_to_bucket, args=(name,)):
+                # Rerun the app so the bucket section shows the new place. Nothing is
+                # refetched: results and photos come from session state and the cache.
+                st.rerun()
 
         # Add vertical spacing between rows
         if (idx + 1) % 3 == 0:  # After every 3 places
             st.write("")  # Empty line for spacing between rows
 
-# Function to generate an itinerary using LangChain
-def plan_itinerary_with_langchain():
+# Display the itinerary bucket. Runs as a fragment so Generate doesn't rerun
+# the search and results section; Remove and Clear rerun the app so the grid
+# re-enables the Add buttons of places that left the bucket.
+@st.fragment
+def display_itinerary_bucket():
+    st.markdown("### 📋 Itinerary Bucket")
+    # Button to clear the entire itinerary bucket
+    if st.button("Clear Itinerary Bucket", on_click=clear_bucket):
+        st.toast("Itinerary bucket cleared!")
+        st.rerun()
+    if st.session_state['itinerary_bucket']:
+        # Display itinerary items with remove buttons
+        for place in list(st.session_state['itinerary_bucket']):
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.write(place)
+            with col2:
+                if st.button("Remove", key=f"remove_{place}", on_click=remove_from_bucket, args=(place,)):
+                    st.rerun()
+    else:
+        st.write("Your itinerary bucket is empty.")
+
+    # Generate itinerary button
+    incremental = st.toggle("Update the last itinerary instead of re-planning", value=True)
+    if st.button("Generate AI Itinerary"):
+        plan_itinerary_with_langchain(incremental)
+
+# Cache key for an itinerary: the places in order, the date and the model
+def itinerary_cache_key(places, date_str, model):
+    return ("itinerary", tuple(places), date_str, model)
+
+# Look up a generated itinerary for any model the router might use
+def get_cached_itinerary(places, date_str):
+    for model in router.models_for("itinerary"):
+        plan = cache.get(itinerary_cache_key(places, date_str, model))
+        if plan is not None:
+            return plan
+    return None
+
+# Run a prompt through the router; returns (model, text)
+def run_itinerary_prompt(prompt):
+    return router.run(
+        "itinerary",
+        lambda model, timeout: (model, get_llm(model, timeout)([HumanMessage(content=prompt)]).content)
+    )
+
+# Ask for a patch to the previous plan for the added and removed stops.
+# Returns (model, plan), or None if the model's reply couldn't be applied or
+# didn't actually add and remove the stops.
+def patch_itinerary(previous_plan, added, removed, date_str):
+    numbered_plan = "\n".join(f"{n}: {line}" for n, line in enumerate(previous_plan.splitlines(), start=1))
+    prompt_template = PromptTemplate(
+        input_variables=["plan", "added", "removed", "date"],
+        template="""Here is a travel itinerary for {date}, with line numbers:
+        {plan}
+
+        Stops to add: {added}
+        Stops to remove: {removed}
+
+        Update the itinerary for these changes, keeping the rest of the plan as it is and adjusting times only where needed.
+        Reply only with edits, one per line, in these forms:
+        REPLACE <line number>: <new line>
+        DELETE <line number>
+        INSERT AFTER <line number>: <new line>
+        """
+    )
+    formatted_prompt = prompt_template.format(
+        plan=numbered_plan,
+        added=", ".join(added) or "none",
+        removed=", ".join(removed) or "none",
+        date=date_str,
+    )
+    model, patch = run_itinerary_prompt(formatted_prompt)
+    plan = apply_itinerary_patch(previous_plan, patch)
+    if plan is None or not plan_reflects_changes(plan, added, removed):
+        return None
+    return model, plan
+
+# Function to generate an itinerary using LangChain. Itineraries are cached on
+# (places, date, model); in incremental mode, adding or removing stops patches
+# the last plan instead of regenerating it.
+def plan_itinerary_with_langchain(incremental=False):
     if not st.session_state['itinerary_bucket']:
         st.warning("No places in itinerary bucket!")
         return
 
     st.markdown("### 🗺️ AI-Generated Itinerary")
-    places_list = "\n".join(st.session_state['itinerary_bucket'])
+    places = list(st.session_state['itinerary_bucket'])
+    places_list = "\n".join(places)
 
     if selected_date:
         st.info(f"Planning itinerary for {selected_date.strftime('%A, %B %d, %Y')} 🎉")
     else:
         st.info("No specific date chosen. Starting from 9:00 AM by default.")
 
-    prompt_template = PromptTemplate(
-        input_variables=["places", "date"],
-        template="""Plan a travel itinerary for the following places:
-        {places}
-        Date of travel: {date}
-        Provide a detailed plan including the best order to visit, time at each location, transportation time, and meal breaks.
-        """
-    )
-
     date_str = selected_date.strftime('%A, %B %d, %Y') if selected_date else "Not specified"
-    formatted_prompt = prompt_template.format(places=places_list, date=date_str)
 
-    with st.spinner("Generating your itinerary..."):
-        response = llm([HumanMessage(content=formatted_prompt)])
-        st.markdown(response.content)
+    plan = get_cached_itinerary(places, date_str)
+    if plan is not None:
+        st.session_state['last_itinerary'] = {"places": places, "date": date_str, "plan": plan}
+        st.markdown(plan)
+        return
+
+    result = None
+    previous = st.session_state.get('last_itinerary')
+    if incremental and previous and previous["date"] == date_str:
+        added = [place for place in places if place not in previous["places"]]
+        removed = [place for place in previous["places"] if place not in places]
+        kept = [place for place in places if place in previous["places"]]
+        # Only patch when stops were added or removed and the rest kept their order
+        if (added or removed) and kept and kept == [p for p in previous["places"] if p in places]:
+            with st.spinner("Updating your itinerary..."):
+                result = patch_itinerary(previous["plan"], added, removed, date_str)
+
+    if result is None:
+        prompt_template = PromptTemplate(
+            input_variables=["places", "date"],
+            template="""Plan a travel itinerary for the following places:
+            {places}
+            Date of travel: {date}
+            Provide a detailed plan including the best order to visit, time at each location, transportation time, and meal breaks.
+            """
+        )
+        formatted_prompt = prompt_template.format(places=places_list, date=date_str)
+
+        with st.spinner("Generating your itinerary..."):
+            result = run_itinerary_prompt(formatted_prompt)
+
+    model, plan = result
+    cache.set(itinerary_cache_key(places, date_str, model), plan, ITINERARY_TTL)
+    st.session_state['last_itinerary'] = {"places": places, "date": date_str, "plan": plan}
+    st.markdown(plan)
 
 # Initialize session state for itinerary bucket and search history
 if 'itinerary_bucket' not in st.session_state:
     st.session_state['itinerary_bucket'] = []
 if 'search_history' not in st.session_state:
     st.session_state['search_history'] = []
+if 'places_results' not in st.session_state:
+    st.session_state['places_results'] = None
+if 'places_request' not in st.session_state:
+    st.session_state['places_request'] = None
+if 'last_itinerary' not in st.session_state:
+    st.session_state['last_itinerary'] = None
 
 # Streamlit app title and sidebar filters
 st.title("🌍 **Travel Planner with AI** ✈️")
@@ -125,8 +248,15 @@ with st.sidebar:
 api_key = st.secrets["api_key"]
 openai_api_key = st.secrets["openai_api_key"]
 
-# Initialize LangChain ChatOpenAI model
-llm = ChatOpenAI(temperature=0.3, model="gpt-4o-mini", openai_api_key=openai_api_key, verbose=True)
+# Background prefetcher for this session, kept alive by reruns
+if 'prefetcher' not in st.session_state:
+    st.session_state.prefetcher = Prefetcher(api_key, st.secrets.get("OpenWeatherAPIkey"))
+st.session_state.prefetcher.touch()
+
+# Build a LangChain ChatOpenAI model for whichever model the router picks
+def get_llm(model, timeout=None):
+    max_retries = 0 if timeout is not None else 2
+    return ChatOpenAI(temperature=0.3, model=model, openai_api_key=openai_api_key, request_timeout=timeout, max_retries=max_retries, verbose=True)
 
 # Handle search input
 user_query = st.text_input("🔍 Search for places (e.g., 'restaurants in Paris'):", value=selected_query)
@@ -136,36 +266,23 @@ if user_query:
         st.session_state["search_history"].append(user_query)
 
     st.markdown(f"### Results for: **{user_query}**")
-    with st.spinner("Fetching places..."):
-        places_data = fetch_places_from_google(user_query)
+    # Only hit the Places API when the query or filters change
+    places_request = (user_query, min_rating, max_results)
+    if st.session_state['places_request'] != places_request:
+        with st.spinner("Fetching places..."):
+            st.session_state['places_results'] = fetch_places_from_google(user_query)
+        st.session_state['places_request'] = places_request
+        # Warm photos and weather for these results, and keep the search fresh
+        st.session_state.prefetcher.track_search(user_query)
+        st.session_state.prefetcher.warm_results(user_query, st.session_state['places_results'])
+    places_data = st.session_state['places_results']
 
     if isinstance(places_data, dict) and "error" in places_data:
         st.error(f"Error: {places_data['error']}")
     elif not places_data:
         st.warning("No places found matching your criteria.")
     else:
-        display_places_grid(places_data)
+        display_places_grid()
 
     # Show itinerary bucket
-    # Show itinerary bucket
-    st.markdown("### 📋 Itinerary Bucket")
-            # Button to clear the entire itinerary bucket
-    if st.button("Clear Itinerary Bucket"):
-        st.session_state['itinerary_bucket'] = []  # Clear the list
-        st.success("Itinerary bucket cleared!")
-    if st.session_state['itinerary_bucket']:
-        # Display itinerary items with remove buttons
-        for place in st.session_state['itinerary_bucket']:
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                st.write(place)
-            with col2:
-                if st.button("Remove", key=f"remove_{place}"):
-                    st.session_state['itinerary_bucket'].remove(place)
-    
-    else:
-        st.write("Your itinerary bucket is empty.")
-
-    # Generate itinerary button
-    if st.button("Generate AI Itinerary"):
-        plan_itinerary_with_langchain()
+    display_itinerary_bucket()
@@ -5,6 +5,7 @@ import os
 from audio_recorder_streamlit import audio_recorder
 import base64
 import time
+from model_router import router
 
 # Dictionary of countries and their primary languages
 COUNTRY_LANGUAGES = {
@@ -66,8 +67,9 @@ def translate_text(text, target_language):
         {"role": "user", "content": text}
     ]
     
-    response = st.session_state.openai_client.chat.completions.create(
-        model="gpt-4",
+    response = router.chat_completion(
+        st.session_state.openai_client,
+        "translate",
         messages=messages,
         temperature=0.75
     )
@@ -1,12 +1,22 @@
 import streamlit as st
 from openai import OpenAI
 import os
-from PyPDF2 import PdfReader
-__import__('pysqlite3')
 import sys
-sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+from model_router import router
+from numpy_index import NumpyIndex, build_index, read_pdf_texts
+from bm25_index import BM25Index, rrf_fuse
 
-import chromadb
+# Retriever backend: "chroma" (default, for large corpora) or "numpy" for a
+# memory-mapped index built ahead of time with `python numpy_index.py`
+RETRIEVER_BACKEND = st.secrets.get("retriever_backend", "chroma")
+# Answer lookup-style questions (e.g. emergency numbers) straight from the
+# BM25 index, without an LLM call, when the lexical match is unambiguous
+LEXICAL_DIRECT_ANSWERS = st.secrets.get("lexical_direct_answers", False)
+
+# Cosine distance under which a dense hit counts as relevant
+DISTANCE_THRESHOLD = 0.7
+# BM25 score above which a lexical hit counts as relevant
+BM25_SCORE_THRESHOLD = 1.0
 
 # Initialize OpenAI client
 if 'openai_client' not in st.session_state:
@@ -28,28 +38,47 @@ def add_to_collection(collection, text, filename):
     )
     return collection
 
-# Function to set up VectorDB if not already created
+# Function to open the Chroma collection, importing chromadb only when it is used
+def open_chroma_collection(texts):
+    __import__('pysqlite3')
+    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+    import chromadb
+
+    client = chromadb.PersistentClient()
+    collection = client.get_or_create_collection(
+        name="travelfaq_collection",
+        metadata={"hnsw:space": "cosine", "hnsw:M": 32}
+    )
+
+    for pdf_file, text in texts:
+        collection = add_to_collection(collection, text, pdf_file)
+    return collection
+
+# Function to open the NumPy index, building it first if the artifact is missing.
+# Sessions that build at the same time each write the whole artifact atomically.
+def open_numpy_index():
+    if not NumpyIndex.exists():
+        datafiles_path = os.path.join(os.getcwd(), "datafiles")
+        return build_index(st.session_state.openai_client, datafiles_path)
+    return NumpyIndex.load()
+
+# Function to set up VectorDB and the BM25 index if not already created
 def setup_vectordb():
     if 'travelfaq_vectorDB' not in st.session_state:
-        client = chromadb.PersistentClient()
-        collection = client.get_or_create_collection(
-            name="travelfaq_collection",
-            metadata={"hnsw:space": "cosine", "hnsw:M": 32}
-        )
-        
-        datafiles_path = os.path.join(os.getcwd(), "datafiles")
-        pdf_files = [f for f in os.listdir(datafiles_path) if f.endswith('.pdf')]
-        
-        for pdf_file in pdf_files:
-            file_path = os.path.join(datafiles_path, pdf_file)
-            with open(file_path, 'rb') as file:
-                pdf_reader = PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-                collection = add_to_collection(collection, text, pdf_file)
-        
+        if RETRIEVER_BACKEND == "numpy":
+            collection = open_numpy_index()
+            # build_index writes the BM25 index alongside the vectors
+            if BM25Index.exists():
+                bm25_index = BM25Index.load()
+            else:
+                bm25_index = BM25Index.from_documents(zip(collection.ids, collection.documents))
+        else:
+            texts = read_pdf_texts(os.path.join(os.getcwd(), "datafiles"))
+            collection = open_chroma_collection(texts)
+            bm25_index = BM25Index.from_documents(texts)
+
         st.session_state.travelfaq_vectorDB = collection
+        st.session_state.travelfaq_bm25 = bm25_index
         st.success(f"Welcome to Trip Assistor")
     else:
         st.info("Welcome to Trip Assistor Dear!!")
@@ -74,6 +103,33 @@ def query_vectordb(query, k=3):
         st.error("VectorDB not set up. Please set up the VectorDB first.")
         return None
 
+# Function to combine dense and BM25 results with reciprocal rank fusion.
+# Returns (context, direct_answer); direct_answer is set only for confident lookups.
+def hybrid_search(query):
+    bm25_index = st.session_state.travelfaq_bm25
+    lexical_hits = [hit for hit in bm25_index.search(query) if hit[1] >= BM25_SCORE_THRESHOLD]
+    if LEXICAL_DIRECT_ANSWERS:
+        direct_answer = bm25_index.direct_answer(query)
+        if direct_answer:
+            return "", direct_answer
+
+    results = query_vectordb(query)
+    dense_docs = {}
+    if results and results['documents'][0]:
+        for doc_id, doc, distance in zip(results['ids'][0], results['documents'][0], results['distances'][0]):
+            if distance < DISTANCE_THRESHOLD:
+                dense_docs[doc_id] = doc
+
+    fused = rrf_fuse([list(dense_docs), bm25_index.rank_documents(lexical_hits)])
+    context_parts = []
+    for doc_id in fused:
+        if doc_id in dense_docs:
+            context_parts.append(dense_docs[doc_id])
+        else:
+            # Only matched lexically: use its matching passages
+            context_parts.extend(bm25_index.passages[index] for index, _ in lexical_hits if bm25_index.doc_ids[index] == doc_id)
+    return " ".join(context_parts), None
+
 # Function to get a response from OpenAI using the retrieved context
 def get_ai_response(query, context):
     openai_client = st.session_state.openai_client
@@ -83,8 +139,9 @@ def get_ai_response(query, context):
     ]
     for msg in st.session_state.messages:
         messages.append(msg)
-    response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
+    response = router.chat_completion(
+        openai_client,
+        "faq_answer",
         messages=messages,
         max_tokens=150
     )
@@ -111,23 +168,18 @@ if prompt := st.chat_input("Hello Travelor, How can I help you?"):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # Query VectorDB for relevant documents
-    results = query_vectordb(prompt)
-    
-    # Set a distance threshold (adjust as needed)
-    DISTANCE_THRESHOLD = 0.7
-    
-    if results and results['documents'][0] and results['distances'][0][0] < DISTANCE_THRESHOLD:
-        # Retrieve document content from the vector DB and use it as context
-        context = " ".join([doc for doc in results['documents'][0]])
+    # Query the VectorDB and BM25 index for relevant documents
+    context, direct_answer = hybrid_search(prompt)
+
+    if direct_answer:
+        # Exact lookup answered from the index, no LLM call needed
+        response = direct_answer
+    elif context:
+        # Use the fused retrieval results as context for the RAG pipeline
         response = get_ai_response(prompt, context)
-        # Indicate that the bot is using context from the RAG pipeline
-        st.session_state.messages.append({"role": "system", "content": response})
-        with st.chat_message("system"):
-            st.markdown(response)
     else:
         # If no relevant documents were found, generate response without document context
         response = get_ai_response(prompt, "")
-        st.session_state.messages.append({"role": "system", "content":response})
-        with st.chat_message("system"):
-            st.markdown(response)
+    st.session_state.messages.append({"role": "system", "content": response})
+    with st.chat_message("system"):
+        st.markdown(response)
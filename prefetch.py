@@ -0,0 +1,320 @@
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PLACES_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+# How long fetched data stays fresh, in seconds
+PLACES_TTL = 15 * 60
+WEATHER_TTL = 10 * 60
+PHOTO_TTL = 60 * 60
+# Seconds to wait on an upstream before giving up, so hung calls can't tie up the pool
+REQUEST_TIMEOUT = 10
+# Entries kept in the shared cache across all sessions (photos are tens of KiB each)
+CACHE_MAX_ENTRIES = 500
+
+# Shared by every session: a small pool so prefetching can't crowd out page work
+MAX_WORKERS = 4
+# Pending prefetches allowed per session before new ones are dropped
+MAX_PENDING = 16
+# Minimum seconds between prefetch requests to each upstream
+RATE_LIMITS = {"google": 0.2, "openweather": 1.0}
+
+# A session counts as idle after this long without a rerun, and as ended after SESSION_TIMEOUT
+IDLE_AFTER = 30
+SESSION_TIMEOUT = 30 * 60
+# While idle, refresh recent searches whose cached results expire within this window
+REFRESH_WINDOW = 2 * 60
+# Number of recent searches kept warm per session
+RECENT_SEARCHES = 5
+MONITOR_INTERVAL = 10
+
+
+# A thread-safe cache whose entries expire after a per-entry TTL. It holds at
+# most max_entries, evicting the least recently used entry when full.
+class TTLCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Drop every expired entry, not just the ones that get read again
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    # Seconds until key expires, or None if it isn't cached
+    def expires_in(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[0] - time.time()
+
+
+# Spaces out requests to an upstream so prefetching stays within its rate limit
+class RateLimiter:
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            wait_time = max(0.0, self._next_time - now)
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if wait_time:
+            time.sleep(wait_time)
+
+
+cache = TTLCache()
+_rate_limiters = {name: RateLimiter(interval) for name, interval in RATE_LIMITS.items()}
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="prefetch")
+# Prefetches queued or running in any session, by cache key, so the same item
+# isn't fetched twice and page code can wait for one instead of refetching
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+# Raw Google Places text search results for a query, or {"error": ...} on failure
+def search_places(query, api_key, refresh=False):
+    key = ("places", query)
+    results = None if refresh else cache.get(key)
+    if results is None:
+        response = requests.get(PLACES_URL, params={"query": query, "key": api_key}, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 200:
+            return {"error": f"API error {response.status_code}: {response.text}"}
+        results = response.json().get("results", [])
+        cache.set(key, results, PLACES_TTL)
+    return results
+
+
+# Current weather data for a city from OpenWeatherMap
+def fetch_weather(location, api_key):
+    if "," in location:
+        location = location.split(",")[0].strip()
+    key = ("weather", location.lower())
+    data = cache.get(key)
+    if data is None:
+        response = requests.get(WEATHER_URL, params={"q": location, "appid": api_key}, timeout=REQUEST_TIMEOUT)
+        data = response.json()
+        if response.status_code == 200:
+            cache.set(key, data, WEATHER_TTL)
+    return data
+
+
+# Raw bytes of a Places photo
+def fetch_photo(url):
+    key = ("photo", url)
+    content = cache.get(key)
+    if content is None:
+        # Join a prefetch of this photo rather than downloading it a second time
+        _join_in_flight(key)
+        content = cache.get(key)
+    if content is None:
+        content = _download_photo(url)
+    return content
+
+
+def _download_photo(url):
+    response = requests.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    cache.set(("photo", url), response.content, PHOTO_TTL)
+    return response.content
+
+
+# Wait for the prefetch of key, if one is queued or running
+def _join_in_flight(key):
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+    if future is None:
+        return
+    try:
+        future.result(timeout=REQUEST_TIMEOUT)
+    except Exception:
+        # Cancelled, failed or too slow; the caller fetches it itself
+        pass
+
+
+def photo_url(place, api_key, max_width=400):
+    if "photos" not in place:
+        return None
+    photo_ref = place["photos"][0]["photo_reference"]
+    return f"https://maps.googleapis.com/maps/api/place/photo?maxwidth={max_width}&photoreference={photo_ref}&key={api_key}"
+
+
+# Best guess at the city in a query like "restaurants in Paris"
+def city_from_query(query):
+    match = re.search(r"\b(?:in|near|at)\s+(.+)$", query.strip(), re.IGNORECASE)
+    return match.group(1).strip() if match else None
+
+
+# Warms the shared cache in the background for one session. Keep one in
+# session state, call touch() on every rerun, and cancel() when the session ends;
+# sessions that stop rerunning for SESSION_TIMEOUT are cancelled automatically.
+class Prefetcher:
+    def __init__(self, api_key, weather_api_key):
+        self.api_key = api_key
+        self.weather_api_key = weather_api_key
+        self.last_activity = time.time()
+        self.recent_searches = []
+        self._pending = {}
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        _register(self)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def touch(self):
+        self.last_activity = time.time()
+
+    # Run fn in the background under an upstream's rate limit, unless key is
+    # already cached or being prefetched or the session already has too much queued
+    def submit(self, key, fn, upstream, force=False):
+        if self.cancelled or (not force and cache.get(key) is not None):
+            return False
+        with self._lock, _in_flight_lock:
+            if key in _in_flight or len(self._pending) >= MAX_PENDING:
+                return False
+            future = _executor.submit(self._run, key, fn, upstream, force)
+            self._pending[key] = future
+            _in_flight[key] = future
+        future.add_done_callback(lambda future: self._done(key, future))
+        return True
+
+    def _run(self, key, fn, upstream, force):
+        if self.cancelled:
+            return
+        _rate_limiters[upstream].wait()
+        # The page may have fetched it while this waited its turn
+        if self.cancelled or (not force and cache.get(key) is not None):
+            return
+        try:
+            fn()
+        except Exception:
+            # Prefetching is best effort; the page fetches for real if needed
+            pass
+
+    def _done(self, key, future):
+        with self._lock, _in_flight_lock:
+            self._pending.pop(key, None)
+            if _in_flight.get(key) is future:
+                del _in_flight[key]
+
+    # Warm photo thumbnails and the city's weather for a Places result set
+    def warm_results(self, query, places):
+        if isinstance(places, dict):
+            return
+        for place in places:
+            url = photo_url(place, self.api_key)
+            if url:
+                self.submit(("photo", url), lambda url=url: _download_photo(url), "google")
+        self.warm_weather(query)
+
+    # Warm the weather for the city in a query such as "museums in Rome"
+    def warm_weather(self, query):
+        city = city_from_query(query)
+        if city and self.weather_api_key:
+            self.submit(
+                ("weather", city.split(",")[0].strip().lower()),
+                lambda: fetch_weather(city, self.weather_api_key),
+                "openweather",
+            )
+
+    # Remember a search so it is kept warm while the session is idle
+    def track_search(self, query):
+        if query in self.recent_searches:
+            self.recent_searches.remove(query)
+        self.recent_searches.append(query)
+        del self.recent_searches[:-RECENT_SEARCHES]
+
+    # Refresh recent searches whose cached results are about to expire
+    def refresh_expiring(self):
+        for query in list(self.recent_searches):
+            key = ("places", query)
+            expires_in = cache.expires_in(key)
+            if expires_in is not None and expires_in < REFRESH_WINDOW:
+                self.submit(
+                    key,
+                    lambda query=query: search_places(query, self.api_key, refresh=True),
+                    "google",
+                    force=True,
+                )
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            pending = list(self._pending.values())
+        for future in pending:
+            future.cancel()
+
+
+_prefetchers = weakref.WeakSet()
+_monitor_lock = threading.Lock()
+_monitor = None
+
+
+def _register(prefetcher):
+    global _monitor
+    with _monitor_lock:
+        _prefetchers.add(prefetcher)
+        if _monitor is None:
+            _monitor = threading.Thread(target=_monitor_loop, name="prefetch-monitor", daemon=True)
+            _monitor.start()
+
+
+# Purge expired cache entries, refresh idle sessions' recent searches and
+# cancel sessions that have ended
+def _monitor_loop():
+    while True:
+        time.sleep(MONITOR_INTERVAL)
+        cache.purge_expired()
+        now = time.time()
+        # _register adds from script threads; iterating a WeakSet while it
+        # changes raises and would kill this thread
+        with _monitor_lock:
+            prefetchers = list(_prefetchers)
+        for prefetcher in prefetchers:
+            if prefetcher.cancelled:
+                continue
+            idle = now - prefetcher.last_activity
+            if idle > SESSION_TIMEOUT:
+                prefetcher.cancel()
+            elif idle > IDLE_AFTER:
+                prefetcher.refresh_expiring()
@@ -0,0 +1,41 @@
+import os
+
+from bm25_index import BM25Index, split_passages
+from numpy_index import read_pdf_texts
+
+DATAFILES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datafiles")
+
+
+def test_split_passages_keeps_last_line():
+    text = "\n".join(f"line {i}" for i in range(10))
+    passages = split_passages(text)
+    assert passages[-1] == "line 7\nline 8\nline 9"
+
+
+def test_split_passages_short_text():
+    assert split_passages("only line") == ["only line"]
+
+
+def _faq_index():
+    return BM25Index.from_documents(read_pdf_texts(DATAFILES))
+
+
+def test_direct_answer_country_lookups():
+    index = _faq_index()
+    expected = {
+        "What is the phone number in Japan?": "Japan: +81",
+        "What number do I dial in Italy?": "Italy: +44 20 8762 8008",
+        "Germany emergency contact": "Germany: +49 6102 3588 100",
+        "What is the SOS number for Kenya?": "Kenya: +27 11 541 1300",
+        "Japan phone": "Japan: +81",
+    }
+    for query, answer in expected.items():
+        assert answer in (index.direct_answer(query) or ""), query
+
+
+def test_direct_answer_needs_lookup_and_unambiguous_match():
+    index = _faq_index()
+    assert index.direct_answer("How do I use the translator?") is None
+    assert index.direct_answer("What is the emergency number?") is None
+    # London appears on many lines, so there is no single answer
+    assert index.direct_answer("London phone number") is None
@@ -0,0 +1,34 @@
+from itinerary_patch import apply_itinerary_patch, plan_reflects_changes
+
+PLAN = "9:00 Louvre\n12:00 Lunch\n14:00 Eiffel Tower"
+
+
+def test_replace_delete_and_insert():
+    patch = "REPLACE 1: 9:00 Musee d'Orsay\nDELETE 2\nINSERT AFTER 3: 17:00 Arc de Triomphe"
+    assert apply_itinerary_patch(PLAN, patch) == "9:00 Musee d'Orsay\n14:00 Eiffel Tower\n17:00 Arc de Triomphe"
+
+
+def test_insert_after_zero_prepends():
+    assert apply_itinerary_patch(PLAN, "INSERT AFTER 0: 8:00 Breakfast").splitlines()[0] == "8:00 Breakfast"
+
+
+def test_line_zero_is_rejected():
+    assert apply_itinerary_patch(PLAN, "REPLACE 0: 8:00 Breakfast") is None
+    assert apply_itinerary_patch(PLAN, "DELETE 0") is None
+
+
+def test_out_of_range_is_rejected():
+    assert apply_itinerary_patch(PLAN, "DELETE 4") is None
+    assert apply_itinerary_patch(PLAN, "REPLACE 1: 9:00 Orsay\nINSERT AFTER 9: 18:00 Dinner") is None
+
+
+def test_no_edits_is_rejected():
+    assert apply_itinerary_patch(PLAN, "Here is your updated itinerary!") is None
+
+
+def test_patch_that_misses_the_change_is_caught():
+    unchanged = apply_itinerary_patch(PLAN, "REPLACE 1: 9:00 Louvre")
+    assert unchanged == PLAN
+    assert not plan_reflects_changes(unchanged, ["Arc de Triomphe"], ["Louvre"])
+    patched = apply_itinerary_patch(PLAN, "REPLACE 1: 9:00 Arc de Triomphe")
+    assert plan_reflects_changes(patched, ["Arc de Triomphe"], ["Louvre"])
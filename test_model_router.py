@@ -0,0 +1,53 @@
+from model_router import ModelRouter
+
+
+def test_slow_task_does_not_reroute_other_tasks():
+    router = ModelRouter()
+    for _ in range(20):
+        router.record("translate", "gpt-4o-mini", 0.8)
+    for _ in range(3):
+        router.record("itinerary", "gpt-4o-mini", 18.0)
+    assert router.models_for("translate") == ["gpt-4o-mini", "gpt-4o"]
+    assert router.models_for("faq_answer") == ["gpt-4o-mini", "gpt-4o"]
+
+
+def test_primary_over_slo_falls_back_first():
+    router = ModelRouter()
+    for _ in range(10):
+        router.record("translate", "gpt-4o-mini", 6.0)
+    assert router.models_for("translate") == ["gpt-4o", "gpt-4o-mini"]
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_fast_rate_limits_demote_primary():
+    router = ModelRouter()
+
+    def call(model, timeout):
+        if model == "gpt-4o-mini":
+            raise RateLimited()
+        return model
+
+    for _ in range(20):
+        router.run("translate", call)
+    assert router.models_for("translate") == ["gpt-4o", "gpt-4o-mini"]
+
+
+def test_demoted_primary_recovers():
+    now = [0.0]
+    router = ModelRouter(clock=lambda: now[0])
+    for _ in range(10):
+        router.record("translate", "gpt-4o-mini", 6.0)
+    tried = []
+
+    def call(model, timeout):
+        tried.append(model)
+        return model
+
+    for _ in range(200):
+        now[0] += 2.0
+        router.run("translate", call)
+    assert "gpt-4o-mini" in tried
+    assert router.models_for("translate") == ["gpt-4o-mini", "gpt-4o"]
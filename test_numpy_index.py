@@ -0,0 +1,36 @@
+import numpy as np
+
+from numpy_index import NumpyIndex, _normalize
+
+
+def _index():
+    embeddings = _normalize(np.array([[1.0, 0.0], [0.6, 0.8], [0.0, 1.0]], dtype=np.float32))
+    return NumpyIndex(embeddings, ["east", "diagonal", "north"], ["e doc", "d doc", "n doc"])
+
+
+def test_query_orders_by_similarity():
+    results = _index().query([[1.0, 0.1]], n_results=2)
+    assert results["ids"] == [["east", "diagonal"]]
+    assert results["documents"] == [["e doc", "d doc"]]
+    distances = results["distances"][0]
+    assert distances[0] < distances[1]
+
+
+def test_query_returns_everything_when_asking_for_more():
+    results = _index().query([[0.0, 1.0]], n_results=10)
+    assert results["ids"] == [["north", "diagonal", "east"]]
+    assert np.isclose(results["distances"][0][0], 0.0, atol=1e-6)
+
+
+def test_query_include_filters_keys():
+    results = _index().query([[1.0, 0.0]], n_results=1, include=["documents"])
+    assert set(results) == {"ids", "documents"}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "index")
+    _index().save(path)
+    assert NumpyIndex.exists(path)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index.json", "index.npy"]
+    loaded = NumpyIndex.load(path)
+    assert loaded.query([[0.0, 1.0]], n_results=1)["ids"] == [["north"]]